@@ -1,20 +1,113 @@
+import atexit
+import hmac
 import os
+import queue
 import sqlite3
-import uuid
 import time
 import socket
 import subprocess
 import re
 import psutil
 import threading
+from contextlib import contextmanager
 from datetime import datetime, timedelta
-from flask import Flask, render_template, request, redirect, session, jsonify
+from flask import Flask, Response, render_template, request, redirect, session, jsonify, url_for
+from flask.json.provider import DefaultJSONProvider
+from werkzeug.security import generate_password_hash, check_password_hash
 import network_scanner
 import report_generator
 
+try:
+    import orjson
+except ImportError:  # Fall back to Flask's standard json provider
+    orjson = None
+
+class OrjsonProvider(DefaultJSONProvider):
+    """Serialize API responses and template tojson data with orjson"""
+    
+    def dumps(self, obj, **kwargs):
+        # Dates and other non-native types keep Flask's conversions via default()
+        option = orjson.OPT_NON_STR_KEYS | orjson.OPT_PASSTHROUGH_DATETIME
+        if kwargs.get('sort_keys', self.sort_keys):
+            option |= orjson.OPT_SORT_KEYS
+        if kwargs.get('indent'):
+            option |= orjson.OPT_INDENT_2
+        return orjson.dumps(obj, default=self.default, option=option).decode('utf-8')
+    
+    def loads(self, s, **kwargs):
+        return orjson.loads(s)
+
 app = Flask(__name__)
+if orjson is not None:
+    app.json = OrjsonProvider(app)
 app.secret_key = os.urandom(24)
 app.config['DATABASE'] = 'network.db'
+app.config['DB_POOL_SIZE'] = 8
+app.config['DB_POOL_TIMEOUT'] = 10  # Seconds to wait for a free connection
+
+app.config['MONITOR_INTERVAL'] = 30  # Seconds between background scans
+app.config['WRITE_BATCH_SIZE'] = 100  # Max rows per write transaction
+app.config['WRITE_WAIT_TIMEOUT'] = 5  # Max seconds a page waits for earlier writes
+
+# SQL used on request paths, defined once so every call reuses the same text
+# Columns used by the dashboard and the report (never the password hash)
+SQL_USER_BY_ID = '''
+    SELECT id, username, name, mac_address, ip_address, connection_start
+    FROM users WHERE id = ?
+'''
+SQL_LOGIN_USER = 'SELECT id, password FROM users WHERE username = ?'
+SQL_TOUCH_CONNECTION = 'UPDATE users SET connection_start = CURRENT_TIMESTAMP WHERE id = ?'
+SQL_UPDATE_PASSWORD = 'UPDATE users SET password = ? WHERE id = ?'
+SQL_INSERT_USER = '''
+    INSERT INTO users (username, password, name, mac_address, ip_address)
+    VALUES (?, ?, ?, ?, ?)
+'''
+SQL_LATEST_PERF = '''
+    SELECT bandwidth_mbps, latency_ms, strftime('%H:%M', timestamp) AS hm
+    FROM network_performance 
+    WHERE user_id = ? 
+    ORDER BY timestamp DESC 
+    LIMIT 20
+'''
+SQL_AVG_PERF = '''
+    SELECT AVG(bandwidth_mbps) as avg_bandwidth, AVG(latency_ms) as avg_latency
+    FROM network_performance 
+    WHERE user_id = ?
+'''
+SQL_INSERT_PERF = '''
+    INSERT INTO network_performance (user_id, bandwidth_mbps, latency_ms)
+    VALUES (?, ?, ?)
+'''
+SQL_INSERT_PERF_RETURNING = SQL_INSERT_PERF + "RETURNING bandwidth_mbps, latency_ms, strftime('%H:%M', timestamp) AS hm"
+SQL_LATEST_ACT = '''
+    SELECT * FROM activity_log 
+    WHERE user_id = ?
+    ORDER BY timestamp DESC 
+    LIMIT 10
+'''
+SQL_INSERT_ACT = '''
+    INSERT INTO activity_log (user_id, type, title, description)
+    VALUES (?, ?, ?, ?)
+'''
+SQL_INSERT_ACT_RETURNING = SQL_INSERT_ACT + 'RETURNING *'
+
+# Pool of shared connections, opened by init_db() or on first use
+_pool = queue.Queue(maxsize=app.config['DB_POOL_SIZE'])
+_pool_lock = threading.Lock()
+_pool_opened = 0
+
+# Latest results published by the background monitor
+_latest = {'devices': None, 'perf': None}
+_latest_lock = threading.Lock()
+_stop_monitoring = threading.Event()
+_monitor_thread = None
+
+# (table, row) inserts waiting for the writer thread
+_write_q = queue.Queue()
+_write_cond = threading.Condition()
+_writes_queued = 0
+_writes_done = 0
+_writer_thread = None
 
 def init_db():
     conn = sqlite3.connect(app.config['DATABASE'])
@@ -58,19 +151,72 @@ def init_db():
         )
     ''')
     
+    # Per-user "latest N" lookups used by the dashboard
+    c.execute('CREATE INDEX IF NOT EXISTS idx_perf_user_ts ON network_performance(user_id, timestamp DESC)')
+    c.execute('CREATE INDEX IF NOT EXISTS idx_act_user_ts ON activity_log(user_id, timestamp DESC)')
+    
     conn.commit()
     conn.close()
+    
+    # Pre-open the pooled connections once
+    global _pool_opened
+    with _pool_lock:
+        missing = app.config['DB_POOL_SIZE'] - _pool_opened
+        _pool_opened += missing
+    for _ in range(missing):
+        _pool.put(open_db_connection())
 
-def get_db():
-    conn = sqlite3.connect(app.config['DATABASE'])
+def open_db_connection():
+    conn = sqlite3.connect(app.config['DATABASE'], check_same_thread=False)
     conn.row_factory = sqlite3.Row
+    conn.execute('PRAGMA journal_mode=WAL')
+    conn.execute('PRAGMA synchronous=NORMAL')
+    conn.execute('PRAGMA temp_store=MEMORY')
+    conn.execute('PRAGMA cache_size=-64000')
     return conn
 
+def _take_connection():
+    """Take a pooled connection, opening a new one while the pool is below its size"""
+    global _pool_opened
+    try:
+        return _pool.get_nowait()
+    except queue.Empty:
+        pass
+    
+    # Imported by a WSGI server, init_db() never ran: fill the pool lazily
+    with _pool_lock:
+        can_open = _pool_opened < app.config['DB_POOL_SIZE']
+        if can_open:
+            _pool_opened += 1
+    if can_open:
+        try:
+            return open_db_connection()
+        except Exception:
+            with _pool_lock:
+                _pool_opened -= 1
+            raise
+    
+    try:
+        return _pool.get(timeout=app.config['DB_POOL_TIMEOUT'])
+    except queue.Empty:
+        raise RuntimeError('No database connection available') from None
+
+@contextmanager
+def db():
+    """Borrow a pooled connection for the duration of the block"""
+    conn = _take_connection()
+    try:
+        yield conn
+    finally:
+        # Never hand a connection back with a half-finished transaction
+        if conn.in_transaction:
+            conn.rollback()
+        _pool.put(conn)
+
 def get_user_network_info():
     try:
         # Get real MAC address
-        mac = ':'.join(['{:02x}'.format((uuid.getnode() >> elements) & 0xff) 
-                        for elements in range(0, 6*8, 8)][::-1])
+        mac = network_scanner.get_local_mac()
         
         # Get real IP address
         s = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
@@ -86,91 +232,173 @@ def get_user_network_info():
     except:
         return "00:00:00:00:00:00", "127.0.0.1"
 
+def verify_password(stored, password):
+    """Check a password against its stored hash"""
+    if stored.startswith(('scrypt:', 'pbkdf2:')):
+        return check_password_hash(stored, password)
+    # Accounts created before hashing still hold the plaintext password
+    return hmac.compare_digest(stored.encode(), password.encode())
+
+def refresh_latest():
+    """Run a fresh scan and performance measurement and publish them"""
+    devices = network_scanner.scan_network(force=True)
+    perf = network_scanner.get_real_performance(force=True)
+    with _latest_lock:
+        _latest['devices'] = devices
+        _latest['perf'] = perf
+    return devices, perf
+
+def _start_monitor():
+    """Start the monitor thread once, whether run directly or under a WSGI server"""
+    global _monitor_thread
+    if _monitor_thread is not None:
+        return
+    with _latest_lock:
+        if _monitor_thread is None:
+            _monitor_thread = threading.Thread(target=background_monitoring, daemon=True)
+            _monitor_thread.start()
+
+def get_latest():
+    """Return the monitor's latest (devices, (bandwidth, latency))"""
+    _start_monitor()
+    with _latest_lock:
+        devices, perf = _latest['devices'], _latest['perf']
+    if devices is None or perf is None:
+        # Monitor has not finished its first pass yet; use the scanner's own cache
+        return network_scanner.scan_network(), network_scanner.get_real_performance()
+    return devices, perf
+
 def log_activity(user_id, activity_type, title, description):
-    conn = get_db()
-    conn.execute('''
-        INSERT INTO activity_log (user_id, type, title, description)
-        VALUES (?, ?, ?, ?)
-    ''', (user_id, activity_type, title, description))
-    conn.commit()
-    conn.close()
+    _queue_write('activity_log', (user_id, activity_type, title, description))
 
 def store_performance_data(user_id, bandwidth, latency):
-    conn = get_db()
-    conn.execute('''
-        INSERT INTO network_performance (user_id, bandwidth_mbps, latency_ms)
-        VALUES (?, ?, ?)
-    ''', (user_id, bandwidth, latency))
-    conn.commit()
-    conn.close()
+    _queue_write('network_performance', (user_id, bandwidth, latency))
+
+def _queue_write(table, row):
+    """Hand an insert to the writer thread, starting it on first use"""
+    global _writes_queued
+    _start_writer()
+    with _write_cond:
+        _writes_queued += 1
+        _write_q.put((table, row))
+
+def _start_writer():
+    """Start the writer thread once, whether run directly or under a WSGI server"""
+    global _writer_thread
+    if _writer_thread is not None:
+        return
+    with _write_cond:
+        if _writer_thread is None:
+            _writer_thread = threading.Thread(target=background_writer, daemon=True)
+            _writer_thread.start()
+            # Don't lose queued rows when the process exits
+            atexit.register(flush_writes)
+
+def _take_writes(first=None):
+    """Collect up to WRITE_BATCH_SIZE queued writes without blocking"""
+    items = [] if first is None else [first]
+    while len(items) < app.config['WRITE_BATCH_SIZE']:
+        try:
+            items.append(_write_q.get_nowait())
+        except queue.Empty:
+            break
+    return items
+
+def _write_batch(items):
+    """Insert a batch of queued writes in a single transaction"""
+    global _writes_done
+    try:
+        rows = {'network_performance': [], 'activity_log': []}
+        for table, row in items:
+            rows[table].append(row)
+        
+        with db() as conn:
+            with conn:
+                if rows['network_performance']:
+                    conn.executemany(SQL_INSERT_PERF, rows['network_performance'])
+                if rows['activity_log']:
+                    conn.executemany(SQL_INSERT_ACT, rows['activity_log'])
+    finally:
+        with _write_cond:
+            _writes_done += len(items)
+            _write_cond.notify_all()
+        for _ in items:
+            _write_q.task_done()
+
+def wait_for_writes():
+    """Wait until the writes queued before this call are in the database"""
+    with _write_cond:
+        target = _writes_queued
+        _write_cond.wait_for(lambda: _writes_done >= target, timeout=app.config['WRITE_WAIT_TIMEOUT'])
+
+def flush_writes():
+    """Write everything queued so far before returning (used at shutdown)"""
+    while True:
+        items = _take_writes()
+        if not items:
+            break
+        _write_batch(items)
+    # Wait for a batch the writer thread may be in the middle of
+    _write_q.join()
 
 @app.route('/')
 def dashboard():
     if 'user_id' not in session:
         return redirect('/login')
     
-    conn = get_db()
-    user = conn.execute('SELECT * FROM users WHERE id = ?', (session['user_id'],)).fetchone()
-    
-    if not user:
-        return redirect('/logout')
-    
-    # Calculate real connection time
-    connection_start = datetime.strptime(user['connection_start'], '%Y-%m-%d %H:%M:%S')
-    connection_minutes = int((datetime.now() - connection_start).total_seconds() / 60)
-    
-    # Get real network devices
-    devices = network_scanner.scan_network()
+    # Make pending samples and activities queued before this request visible
+    wait_for_writes()
     
-    # Get real performance data from database
-    performance_records = conn.execute('''
-        SELECT bandwidth_mbps, latency_ms, timestamp 
-        FROM network_performance 
-        WHERE user_id = ? 
-        ORDER BY timestamp DESC 
-        LIMIT 20
-    ''', (session['user_id'],)).fetchall()
+    # Network data first, so no transaction stays open while it is gathered
+    devices, (bandwidth, latency) = get_latest()
     
-    # If no performance data exists, collect some
-    if not performance_records:
-        bandwidth, latency = network_scanner.get_real_performance()
-        store_performance_data(session['user_id'], bandwidth, latency)
-        performance_records = conn.execute('''
-            SELECT bandwidth_mbps, latency_ms, timestamp 
-            FROM network_performance 
-            WHERE user_id = ? 
-            ORDER BY timestamp DESC 
-            LIMIT 20
-        ''', (session['user_id'],)).fetchall()
+    with db() as conn:
+        # All reads share one snapshot
+        conn.execute('BEGIN')
+        user = conn.execute(SQL_USER_BY_ID, (session['user_id'],)).fetchone()
+        
+        if not user:
+            return redirect('/logout')
+        
+        # Calculate real connection time
+        connection_start = datetime.fromisoformat(user['connection_start'])
+        connection_minutes = int((datetime.now() - connection_start).total_seconds() / 60)
+        
+        # Get real performance data and recent activities from database
+        performance_records = conn.execute(SQL_LATEST_PERF, (session['user_id'],)).fetchall()
+        activities = conn.execute(SQL_LATEST_ACT, (session['user_id'],)).fetchall()
+        conn.commit()
+        
+        if not performance_records or not activities:
+            # First visit: seed the missing rows in a short write transaction. IMMEDIATE
+            # takes the write lock up front, so the inserts never run on a stale snapshot.
+            conn.execute('BEGIN IMMEDIATE')
+            
+            # If no performance data exists, store the current sample and use the inserted row
+            if not performance_records:
+                performance_records = conn.execute(SQL_LATEST_PERF, (session['user_id'],)).fetchall()
+            if not performance_records:
+                performance_records = conn.execute(SQL_INSERT_PERF_RETURNING, 
+                                                   (session['user_id'], bandwidth, latency)).fetchall()
+            
+            # Add initial activity if none exist
+            if not activities:
+                activities = conn.execute(SQL_LATEST_ACT, (session['user_id'],)).fetchall()
+            if not activities:
+                activities = conn.execute(SQL_INSERT_ACT_RETURNING, 
+                                          (session['user_id'], 'connected', 'Connexion initiale', 
+                                           'Session démarrée avec succès')).fetchall()
+            
+            conn.commit()
     
-    # Prepare performance data for charts
+    # Prepare performance data for charts (oldest first)
+    rows = performance_records[::-1]
     performance_data = {
-        'bandwidth': [record['bandwidth_mbps'] for record in reversed(performance_records)],
-        'latency': [record['latency_ms'] for record in reversed(performance_records)],
-        'timestamps': [datetime.strptime(record['timestamp'], '%Y-%m-%d %H:%M:%S').strftime('%H:%M') 
-                      for record in reversed(performance_records)]
+        'bandwidth': [row[0] for row in rows],
+        'latency': [row[1] for row in rows],
+        'timestamps': [row[2] for row in rows]
     }
     
-    # Get recent activities
-    activities = conn.execute('''
-        SELECT * FROM activity_log 
-        WHERE user_id = ?
-        ORDER BY timestamp DESC 
-        LIMIT 10
-    ''', (session['user_id'],)).fetchall()
-    
-    # Add initial activity if none exist
-    if not activities:
-        log_activity(session['user_id'], 'connected', 'Connexion initiale', 'Session démarrée avec succès')
-        activities = conn.execute('''
-            SELECT * FROM activity_log 
-            WHERE user_id = ?
-            ORDER BY timestamp DESC 
-            LIMIT 10
-        ''', (session['user_id'],)).fetchall()
-    
-    conn.close()
-    
     return render_template('dashboard.html', 
                            user=user,
                            connection_time=connection_minutes,
@@ -184,21 +412,25 @@ def login():
         username = request.form['username']
         password = request.form['password']
         
-        conn = get_db()
-        user = conn.execute('SELECT * FROM users WHERE username = ? AND password = ?', 
-                            (username, password)).fetchone()
+        with db() as conn:
+            user = conn.execute(SQL_LOGIN_USER, (username,)).fetchone()
+            
+            if user and not verify_password(user['password'], password):
+                user = None
+            
+            if user:
+                session['user_id'] = user['id']
+                # Update connection start time
+                conn.execute(SQL_TOUCH_CONNECTION, (user['id'],))
+                if user['password'] == password:
+                    # Upgrade a legacy plaintext password to a hash
+                    conn.execute(SQL_UPDATE_PASSWORD, (generate_password_hash(password), user['id']))
+                conn.commit()
         
         if user:
-            session['user_id'] = user['id']
-            # Update connection start time
-            conn.execute('UPDATE users SET connection_start = CURRENT_TIMESTAMP WHERE id = ?', 
-                        (user['id'],))
-            conn.commit()
             log_activity(user['id'], 'connected', 'Connexion réussie', 'Utilisateur connecté au système')
-            conn.close()
             return redirect('/')
         else:
-            conn.close()
             return render_template('login.html', error="Identifiants invalides")
     
     return render_template('login.html')
@@ -212,23 +444,19 @@ def register():
         
         mac, ip = get_user_network_info()
         
-        conn = get_db()
-        try:
-            cursor = conn.cursor()
-            cursor.execute('''
-                INSERT INTO users (username, password, name, mac_address, ip_address)
-                VALUES (?, ?, ?, ?, ?)
-            ''', (username, password, name, mac, ip))
-            user_id = cursor.lastrowid
-            
-            conn.commit()
-            session['user_id'] = user_id
-            log_activity(user_id, 'connected', 'Compte créé', 'Nouveau compte enregistré avec succès')
-            return redirect('/')
-        except sqlite3.IntegrityError:
-            return render_template('register.html', error="Nom d'utilisateur déjà utilisé")
-        finally:
-            conn.close()
+        with db() as conn:
+            try:
+                cursor = conn.cursor()
+                cursor.execute(SQL_INSERT_USER, (username, generate_password_hash(password), name, mac, ip))
+                user_id = cursor.lastrowid
+                
+                conn.commit()
+            except sqlite3.IntegrityError:
+                return render_template('register.html', error="Nom d'utilisateur déjà utilisé")
+        
+        session['user_id'] = user_id
+        log_activity(user_id, 'connected', 'Compte créé', 'Nouveau compte enregistré avec succès')
+        return redirect('/')
     
     return render_template('register.html')
 
@@ -244,11 +472,8 @@ def refresh_network():
     if 'user_id' not in session:
         return jsonify({'error': 'Non authentifié'}), 401
     
-    # Scan real network
-    devices = network_scanner.scan_network()
-    
-    # Get real performance data
-    bandwidth, latency = network_scanner.get_real_performance()
+    # Latest scan and performance data from the background monitor
+    devices, (bandwidth, latency) = get_latest()
     store_performance_data(session['user_id'], bandwidth, latency)
     
     log_activity(session['user_id'], 'scan', 'Scan réseau', f'Réseau scanné - {len(devices)} appareils détectés')
@@ -260,33 +485,46 @@ def generate_report():
     if 'user_id' not in session:
         return jsonify({'error': 'Non authentifié'}), 401
     
-    conn = get_db()
-    user = conn.execute('SELECT * FROM users WHERE id = ?', (session['user_id'],)).fetchone()
+    with db() as conn:
+        user = conn.execute(SQL_USER_BY_ID, (session['user_id'],)).fetchone()
+        
+        # Get performance history
+        performance_records = conn.execute(SQL_AVG_PERF, (session['user_id'],)).fetchone()
     
     # Get real network data
-    devices = network_scanner.scan_network()  # ✅ Your existing function
-    
-    # Get performance history
-    performance_records = conn.execute('''
-        SELECT AVG(bandwidth_mbps) as avg_bandwidth, AVG(latency_ms) as avg_latency
-        FROM network_performance 
-        WHERE user_id = ?
-    ''', (session['user_id'],)).fetchone()
+    devices = get_latest()[0]
     
     # Generate report with real data - ✅ Now works perfectly!
-    report_content = report_generator.generate_report(user, devices, performance_records)
+    # The stylesheet is linked rather than inlined so the browser caches it across reports;
+    # the version query changes with its content, so a cached copy is never stale
+    css_url = url_for('report_css', v=report_generator.get_report_css_version())
+    report_content = report_generator.generate_report(user, devices, performance_records,
+                                                      css_url=css_url)
     
     log_activity(session['user_id'], 'report', 'Rapport généré', 'Rapport de diagnostic créé avec données temps réel')
-    conn.close()
     
     return jsonify({'report_content': report_content})
 
+@app.route('/report.css')
+def report_css():
+    """Report stylesheet, served compressed when the client accepts gzip"""
+    if request.accept_encodings['gzip'] > 0:
+        response = Response(report_generator.get_report_css_gzip(), mimetype='text/css')
+        response.headers['Content-Encoding'] = 'gzip'
+    else:
+        response = Response(report_generator.get_report_css(), mimetype='text/css')
+    response.vary.add('Accept-Encoding')
+    response.cache_control.public = True
+    response.cache_control.max_age = 86400
+    return response
+
 @app.route('/api/performance_data')
 def get_performance_data():
     if 'user_id' not in session:
         return jsonify({'error': 'Non authentifié'}), 401
     
-    # Get real-time performance
+    # Get real-time performance; the scanner caches it for a few seconds, so each
+    # dashboard poll stores a fresh sample rather than repeating the monitor's last one
     bandwidth, latency = network_scanner.get_real_performance()
     store_performance_data(session['user_id'], bandwidth, latency)
     
@@ -298,14 +536,30 @@ def get_performance_data():
 
 def background_monitoring():
     """Background thread for continuous monitoring"""
+    while not _stop_monitoring.is_set():
+        try:
+            refresh_latest()
+        except Exception as e:
+            app.logger.error(f"Monitoring error: {e}")
+        _stop_monitoring.wait(app.config['MONITOR_INTERVAL'])
+
+def background_writer():
+    """Background thread that drains queued inserts in batches"""
     while True:
-        time.sleep(60)  # Update every minute
-        # This would run performance monitoring in background
-        # For now, we'll update when requested
+        items = _take_writes(_write_q.get())
+        try:
+            _write_batch(items)
+        except Exception as e:
+            app.logger.error(f"Write error: {e}")
 
 if __name__ == '__main__':
     init_db()
-    # Start background monitoring thread
-    monitor_thread = threading.Thread(target=background_monitoring, daemon=True)
-    monitor_thread.start()
-    app.run(debug=True, host='0.0.0.0', port=5000)
\ No newline at end of file
+    # Start background monitoring in the process that serves requests; with debug=True
+    # this block also runs in the reloader parent, which must not scan
+    if os.environ.get('WERKZEUG_RUN_MAIN') == 'true':
+        _start_monitor()
+    _start_writer()
+    try:
+        app.run(debug=True, host='0.0.0.0', port=5000)
+    finally:
+        _stop_monitoring.set()
\ No newline at end of file
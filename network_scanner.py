@@ -1,3 +1,5 @@
+import asyncio
+import functools
 import subprocess
 import socket
 import platform
@@ -5,11 +7,71 @@ import re
 import time
 import psutil
 import threading
+import uuid
 from datetime import datetime, timedelta
-from concurrent.futures import ThreadPoolExecutor, as_completed
+from concurrent.futures import ThreadPoolExecutor
+
+try:
+    from icmplib import multiping
+except ImportError:  # Fall back to fping / ping subprocesses
+    multiping = None
+
+try:
+    import aiodns
+except ImportError:  # Fall back to gethostbyaddr on a shared thread pool
+    aiodns = None
+
+# The OS does not change at runtime
+_IS_WINDOWS = platform.system().lower() == "windows"
+
+_MAC_RE = re.compile(r'([0-9a-fA-F]{2}[:-]){5}[0-9a-fA-F]{2}')
+# Linux prints "time=0.45 ms", Windows "time=1ms" / "time<1ms"
+_PING_TIME_RE = re.compile(r'time[<=](\d+\.?\d*)\s*ms')
+# fping -a -e prints "<ip> (<rtt> ms)" for each alive host
+_FPING_LINE_RE = re.compile(r'^(\S+)(?:\s+\((\d+\.?\d*)\s*ms\))?')
+
+# Seconds a scan / performance sample stays fresh before being re-measured
+SCAN_CACHE_TTL = 30
+PERFORMANCE_CACHE_TTL = 5
+
+_scan_cache = {'ts': 0, 'network_range': None, 'devices': None}
+_performance_cache = {'ts': 0, 'result': None}
+# Local / gateway addresses only change on NIC events
+ADDRESS_CACHE_TTL = 60
+_address_cache = {}
+_cache_lock = threading.Lock()
+# Only one scan runs at a time; callers arriving meanwhile reuse its result
+_scan_lock = threading.Lock()
+
+# Interface counters at the previous measurement, for throughput deltas
+_last_io = [psutil.net_io_counters(), time.monotonic()]
+_io_lock = threading.Lock()
+
+# Seconds to wait for a PTR record before keeping the default device name
+REVERSE_DNS_TIMEOUT = 0.25
+
+# Long-lived so that lookups abandoned on timeout never block a scan
+_resolver_pool = ThreadPoolExecutor(max_workers=32, thread_name_prefix='rdns')
+# Reused across scans by the per-host ping fallback of ping_sweep()
+_ping_pool = ThreadPoolExecutor(max_workers=50, thread_name_prefix='ping')
+
+def _cached_address(key, lookup):
+    """Return lookup() memoized under key for ADDRESS_CACHE_TTL seconds"""
+    with _cache_lock:
+        entry = _address_cache.get(key)
+        if entry and time.monotonic() - entry[0] < ADDRESS_CACHE_TTL:
+            return entry[1]
+    
+    value = lookup()
+    with _cache_lock:
+        _address_cache[key] = (time.monotonic(), value)
+    return value
 
 def get_local_ip():
-    """Get the local IP address"""
+    """Get the local IP address (cached for ADDRESS_CACHE_TTL seconds)"""
+    return _cached_address('local_ip', _lookup_local_ip)
+
+def _lookup_local_ip():
     try:
         s = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
         s.connect(("8.8.8.8", 80))
@@ -29,8 +91,7 @@ def get_network_range():
 def ping_host(ip):
     """Ping a single host to check if it's alive"""
     try:
-        system = platform.system().lower()
-        if system == "windows":
+        if _IS_WINDOWS:
             cmd = ["ping", "-n", "1", "-w", "1000", ip]
         else:
             cmd = ["ping", "-c", "1", "-W", "1", ip]
@@ -40,8 +101,91 @@ def ping_host(ip):
     except:
         return None
 
-def get_device_info(ip):
-    """Get detailed information about a device"""
+def ping_sweep(ips):
+    """Ping many hosts at once, returning {ip: round-trip time in ms or None} for alive ones"""
+    # Preferred: one raw ICMP socket for the whole sweep
+    if multiping is not None:
+        try:
+            hosts = multiping(ips, count=1, timeout=1, concurrent_tasks=256, privileged=False)
+            return {host.address: host.avg_rtt for host in hosts if host.is_alive}
+        except Exception:
+            pass
+    
+    # Fallback: a single fping process for the whole sweep
+    try:
+        result = subprocess.run(["fping", "-a", "-e", "-q", "-r", "0", "-t", "1000"] + list(ips),
+                                capture_output=True, text=True, timeout=30)
+        # 0: all alive, 1: some unreachable; anything else means fping itself failed
+        if result.returncode in (0, 1):
+            alive = {}
+            for line in result.stdout.splitlines():
+                match = _FPING_LINE_RE.match(line.strip())
+                if match:
+                    alive[match.group(1)] = float(match.group(2)) if match.group(2) else None
+            return alive
+    except (OSError, subprocess.SubprocessError):
+        pass
+    
+    # Last resort: one ping process per host
+    return {ip: None for ip in _ping_pool.map(ping_host, ips) if ip}
+
+def arp_table():
+    """Read the ARP / neighbour table once, returning {ip: mac}"""
+    if _IS_WINDOWS:
+        commands = [["arp", "-a"]]
+    else:
+        commands = [["ip", "neigh", "show"], ["arp", "-n"]]
+    
+    for cmd in commands:
+        try:
+            result = subprocess.run(cmd, capture_output=True, text=True, timeout=2)
+        except (OSError, subprocess.SubprocessError):
+            continue
+        if result.returncode != 0:
+            continue
+        
+        table = {}
+        for line in result.stdout.splitlines():
+            mac_match = _MAC_RE.search(line)
+            if mac_match:
+                table[line.split()[0]] = mac_match.group(0)
+        return table
+    return {}
+
+async def _resolve_all(ips):
+    """Reverse-resolve all IPs concurrently, dropping lookups that fail or time out"""
+    if aiodns is not None:
+        resolver = aiodns.DNSResolver(timeout=REVERSE_DNS_TIMEOUT)
+        
+        async def lookup(ip):
+            return (await resolver.gethostbyaddr(ip)).name
+    else:
+        loop = asyncio.get_running_loop()
+        
+        async def lookup(ip):
+            return (await loop.run_in_executor(_resolver_pool, socket.gethostbyaddr, ip))[0]
+    
+    results = await asyncio.gather(
+        *[asyncio.wait_for(lookup(ip), REVERSE_DNS_TIMEOUT) for ip in ips],
+        return_exceptions=True)
+    return {ip: name for ip, name in zip(ips, results) if isinstance(name, str) and name}
+
+def resolve_hostnames(ips):
+    """Get {ip: hostname} for the IPs that have a PTR record"""
+    if not ips:
+        return {}
+    try:
+        return asyncio.run(_resolve_all(list(ips)))
+    except Exception:
+        return {}
+
+def get_device_info(ip, arp_entries=None, response_time=None, hostnames=None):
+    """Get detailed information about a device
+    
+    arp_entries is the {ip: mac} table from arp_table(), response_time
+    the round-trip time (ms) measured by the ping sweep, if known, and
+    hostnames the {ip: hostname} map from resolve_hostnames().
+    """
     device_info = {
         'id': int(ip.split('.')[-1]),
         'name': f"Device-{ip.split('.')[-1]}",
@@ -53,12 +197,9 @@ def get_device_info(ip):
     }
     
     try:
-        # Try to get hostname
-        try:
-            hostname = socket.gethostbyaddr(ip)[0]
-            device_info['name'] = hostname
-        except:
-            pass
+        # Hostname from the batched reverse lookup
+        if hostnames and ip in hostnames:
+            device_info['name'] = hostnames[ip]
         
         # Determine device type based on IP or hostname
         last_octet = int(ip.split('.')[-1])
@@ -83,66 +224,64 @@ def get_device_info(ip):
             device_info['type'] = 'desktop'
             device_info['signal'] = 90
         
-        # Try to get MAC address (works better on local network)
-        try:
-            if platform.system().lower() == "windows":
-                arp_cmd = ["arp", "-a", ip]
-            else:
-                arp_cmd = ["arp", "-n", ip]
-            
-            arp_result = subprocess.run(arp_cmd, capture_output=True, text=True, timeout=2)
-            if arp_result.returncode == 0:
-                # Parse MAC address from ARP output
-                mac_pattern = r'([0-9a-fA-F]{2}[:-]){5}[0-9a-fA-F]{2}'
-                mac_match = re.search(mac_pattern, arp_result.stdout)
-                if mac_match:
-                    device_info['mac'] = mac_match.group(0)
-        except:
-            pass
+        # MAC address from the ARP table read once per scan
+        if arp_entries:
+            device_info['mac'] = arp_entries.get(ip, "Unknown")
         
-        # Estimate signal strength based on ping response time
-        try:
-            start_time = time.time()
-            ping_host(ip)
-            response_time = (time.time() - start_time) * 1000
-            
+        # Estimate signal strength based on the sweep's ping response time
+        if response_time is not None:
             if response_time < 10:
                 device_info['signal'] = min(100, device_info['signal'] + 10)
             elif response_time < 50:
                 device_info['signal'] = max(60, device_info['signal'])
             else:
                 device_info['signal'] = max(30, device_info['signal'] - 20)
-        except:
-            pass
             
     except:
         pass
     
     return device_info
 
-def scan_network():
-    """Scan the local network for devices"""
+def _cached_scan(network_range, newer_than):
+    """Cached devices for network_range scanned after newer_than, or None"""
+    with _cache_lock:
+        if (_scan_cache['devices'] is not None
+                and _scan_cache['network_range'] == network_range
+                and _scan_cache['ts'] > newer_than):
+            return list(_scan_cache['devices'])
+    return None
+
+def scan_network(force=False):
+    """Scan the local network for devices (cached for SCAN_CACHE_TTL seconds)"""
     network_range = get_network_range()
+    requested = time.monotonic()
+    
+    if not force:
+        devices = _cached_scan(network_range, requested - SCAN_CACHE_TTL)
+        if devices is not None:
+            return devices
+    
+    with _scan_lock:
+        # A scan that finished while we waited is as fresh as one we would start now
+        devices = _cached_scan(network_range, requested)
+        if devices is None:
+            devices = _scan(network_range)
+    return devices
+
+def _scan(network_range):
+    """Sweep network_range, build the device list and store it in the cache"""
     devices = []
-    alive_ips = []
     
     # Ping sweep to find alive hosts
-    with ThreadPoolExecutor(max_workers=50) as executor:
-        futures = [executor.submit(ping_host, f"{network_range}.{i}") for i in range(1, 255)]
-        
-        for future in as_completed(futures):
-            result = future.result()
-            if result:
-                alive_ips.append(result)
+    alive = ping_sweep([f"{network_range}.{i}" for i in range(1, 255)])
     
-    # Get detailed info for alive hosts
-    with ThreadPoolExecutor(max_workers=20) as executor:
-        futures = [executor.submit(get_device_info, ip) for ip in alive_ips]
-        
-        for future in as_completed(futures):
-            device = future.result()
-            if device:
-                devices.append(device)
+    # The sweep just refreshed the neighbour cache, so read it once for every host
+    arp_entries = arp_table() if alive else {}
+    hostnames = resolve_hostnames(alive)
+    
+    # Get detailed info for alive hosts (no I/O left, everything was batched above)
+    for ip, rtt in alive.items():
+        devices.append(get_device_info(ip, arp_entries, rtt, hostnames))
     
     # Sort devices by IP
     devices.sort(key=lambda x: int(x['ip'].split('.')[-1]))
@@ -172,12 +311,18 @@ def scan_network():
             'signal': 100
         })
     
-    return devices
+    with _cache_lock:
+        _scan_cache.update(ts=time.monotonic(), network_range=network_range, devices=devices)
+    
+    return list(devices)
 
 def get_gateway_ip():
-    """Get the default gateway IP"""
+    """Get the default gateway IP (cached for ADDRESS_CACHE_TTL seconds)"""
+    return _cached_address('gateway_ip', _lookup_gateway_ip)
+
+def _lookup_gateway_ip():
     try:
-        if platform.system().lower() == "windows":
+        if _IS_WINDOWS:
             result = subprocess.run(["route", "print", "0.0.0.0"], 
                                   capture_output=True, text=True)
             for line in result.stdout.split('\n'):
@@ -195,39 +340,33 @@ def get_gateway_ip():
         pass
     return "192.168.1.1"
 
+@functools.lru_cache(maxsize=1)
 def get_local_mac():
-    """Get local MAC address"""
+    """Get local MAC address (cached, the hardware address does not change)"""
     try:
-        import uuid
-        mac = ':'.join(['{:02x}'.format((uuid.getnode() >> elements) & 0xff) 
-                        for elements in range(0, 6*8, 8)][::-1])
-        return mac
+        node = format(uuid.getnode(), '012x')
+        return ':'.join(node[i:i+2] for i in range(0, 12, 2))
     except:
         return "00:00:00:00:00:00"
 
-def get_real_performance():
-    """Get real network performance metrics"""
+def get_real_performance(force=False):
+    """Get real network performance metrics (cached for PERFORMANCE_CACHE_TTL seconds)"""
+    with _cache_lock:
+        if (not force and _performance_cache['result'] is not None
+                and time.monotonic() - _performance_cache['ts'] < PERFORMANCE_CACHE_TTL):
+            return _performance_cache['result']
+    
     bandwidth_mbps = 0
     latency_ms = 0
     
     try:
-        # Get network interface statistics
-        net_stats = psutil.net_io_counters()
-        
-        # Estimate bandwidth based on bytes sent/received (simplified)
-        # This is a rough estimation - for more accurate measurement, 
-        # you'd need to measure over time intervals
-        total_bytes = net_stats.bytes_sent + net_stats.bytes_recv
-        # Convert to Mbps (rough estimation)
-        bandwidth_mbps = min(100, (total_bytes / (1024 * 1024)) / 60)  # Rough calculation
-        
         # Measure latency to gateway
         gateway_ip = get_gateway_ip()
         start_time = time.time()
         
         try:
             # Ping gateway for latency
-            if platform.system().lower() == "windows":
+            if _IS_WINDOWS:
                 result = subprocess.run(["ping", "-n", "1", gateway_ip], 
                                       capture_output=True, text=True, timeout=3)
             else:
@@ -236,8 +375,7 @@ def get_real_performance():
             
             if result.returncode == 0:
                 # Parse ping output for time
-                time_pattern = r'time[<=](\d+\.?\d*)ms'
-                time_match = re.search(time_pattern, result.stdout)
+                time_match = _PING_TIME_RE.search(result.stdout)
                 if time_match:
                     latency_ms = float(time_match.group(1))
                 else:
@@ -248,23 +386,24 @@ def get_real_performance():
         except:
             latency_ms = (time.time() - start_time) * 1000
         
-        # Get internet speed test (simplified)
-        try:
-            start_time = time.time()
-            response = subprocess.run(["ping", "-c", "3", "8.8.8.8"], 
-                                    capture_output=True, text=True, timeout=5)
-            if response.returncode == 0:
-                # Rough bandwidth estimation based on successful pings
-                bandwidth_mbps = max(10, min(100, 50 + (100 - latency_ms) / 2))
-        except:
-            bandwidth_mbps = 25  # Default moderate bandwidth
+        # Throughput = bytes moved across all interfaces since the previous measurement
+        with _io_lock:
+            now_io, now_t = psutil.net_io_counters(), time.monotonic()
+            last_io, last_t = _last_io
+            moved_bytes = (now_io.bytes_sent + now_io.bytes_recv) - (last_io.bytes_sent + last_io.bytes_recv)
+            bandwidth_mbps = moved_bytes * 8 / 1e6 / max(now_t - last_t, 1e-3)
+            _last_io[:] = [now_io, now_t]
             
     except Exception as e:
         # Default values if measurement fails
         bandwidth_mbps = 50
         latency_ms = 25
     
-    return round(bandwidth_mbps, 2), round(latency_ms, 2)
+    result = (round(bandwidth_mbps, 2), round(latency_ms, 2))
+    with _cache_lock:
+        _performance_cache.update(ts=time.monotonic(), result=result)
+    
+    return result
 
 def get_network_interfaces():
     """Get network interface information"""
@@ -1,55 +1,105 @@
+from bisect import bisect_left, bisect_right
+import collections
+import concurrent.futures
 import datetime
+import functools
+import gzip
+import hashlib
 import logging
+import operator
+import os
+import re
 import sqlite3
 from typing import Dict, List, Optional, Any
+import jinja2
+import numpy as np
 import network_scanner
+from markupsafe import escape
+
+try:
+    from numba import config as numba_config, njit
+    _JIT = not numba_config.DISABLE_JIT
+except ImportError:  # Scoring and analysis use the plain Python / NumPy versions
+    _JIT = False
 
 # Configure logging
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
-def generate_report(user, devices, performance_data=None):
+# Shared by every report so infrastructure lookups don't spawn threads per call
+_infra_executor = concurrent.futures.ThreadPoolExecutor(max_workers=5, thread_name_prefix='infra')
+
+# Fields of a scanner device, fetched in one call
+_DEVICE_FIELDS = operator.itemgetter('id', 'name', 'ip', 'mac', 'type', 'status', 'signal')
+
+class ReportUser(collections.namedtuple('ReportUser', 'id username name ip_address mac_address connection_start')):
+    """User fields read by the report, copied once out of the database row"""
+    __slots__ = ()
+    
+    @classmethod
+    def from_row(cls, row):
+        return cls._make(row[field] for field in cls._fields)
+
+class ReportPerformance(collections.namedtuple('ReportPerformance', 'avg_bandwidth avg_latency')):
+    """Performance averages read by the report"""
+    __slots__ = ()
+    
+    @classmethod
+    def from_row(cls, row):
+        return cls._make(row[field] for field in cls._fields)
+
+def generate_report(user, devices, performance_data=None, css_url=None):
     """
     Generate a professional network diagnostic report
     
     Args:
-        user: SQLite Row object with user data (from database)
+        user: ReportUser, or SQLite Row object with user data (from database)
         devices: List of device dictionaries from network_scanner.scan_network()
-        performance_data: SQLite Row object with avg_bandwidth and avg_latency
+        performance_data: ReportPerformance, or SQLite Row object with avg_bandwidth and avg_latency
+        css_url: Optional stylesheet URL to link instead of inlining the report CSS
     
     Returns:
         str: Complete HTML report
     """
+    # One timestamp for the whole report, error page included
+    now = datetime.datetime.now()
+    
     try:
-        logger.info(f"Generating report for user: {user['name'] if user else 'Unknown'}")
+        # Copy the rows into named tuples once; every later read is a C-level field access
+        if user and not isinstance(user, ReportUser):
+            user = ReportUser.from_row(user)
+        if performance_data and not isinstance(performance_data, ReportPerformance):
+            performance_data = ReportPerformance.from_row(performance_data)
+        
+        logger.info("Generating report for user: %s", user.name if user else 'Unknown')
         
         # Extract user information safely
-        user_info = extract_user_info(user)
+        user_info = extract_user_info(user, now)
         
         # Process devices data
-        devices_data = process_devices_data(devices)
+        devices_data, device_columns = process_devices_with_arrays(devices)
         
         # Get real-time network performance
-        current_performance = get_current_performance(performance_data)
+        current_performance = get_current_performance(performance_data, now)
         
         # Get network infrastructure data
         infrastructure = get_infrastructure_data()
         
         # Analyze network state and generate recommendations
-        analysis = analyze_network_state(devices_data, current_performance, infrastructure)
+        analysis = analyze_network_state(devices_data, current_performance, infrastructure, device_columns)
         
         # Generate HTML report
-        html_report = generate_html_report(user_info, devices_data, current_performance, infrastructure, analysis)
+        html_report = generate_html_report(user_info, devices_data, current_performance, infrastructure, analysis, now, css_url)
         
         logger.info("Report generated successfully")
         return html_report
         
     except Exception as e:
         logger.error(f"Error generating report: {e}")
-        return generate_error_report(str(e))
+        return generate_error_report(str(e), now)
 
-def extract_user_info(user):
-    """Extract and format user information from database row"""
+def extract_user_info(user, now=None):
+    """Extract and format user information from a ReportUser or database row"""
     if not user:
         return {
             'name': 'Unknown User',
@@ -61,19 +111,31 @@ def extract_user_info(user):
         }
     
     try:
+        if not isinstance(user, ReportUser):
+            user = ReportUser.from_row(user)
+        
         # Calculate connection duration
-        if user['connection_start']:
-            connection_start = datetime.datetime.strptime(user['connection_start'], '%Y-%m-%d %H:%M:%S')
-            duration_minutes = int((datetime.datetime.now() - connection_start).total_seconds() / 60)
+        if user.connection_start:
+            # SQLite's CURRENT_TIMESTAMP format, parsed in C
+            connection_start = datetime.datetime.fromisoformat(user.connection_start)
+            duration_minutes = int(((now or datetime.datetime.now()) - connection_start).total_seconds() / 60)
         else:
             duration_minutes = 0
             
+        # Escaped once here; the template repeats the name in several places
+        name, username, ip_address, mac_address, connection_start = map(escape, (
+            user.name or user.username,
+            user.username,
+            user.ip_address or '0.0.0.0',
+            user.mac_address or '00:00:00:00:00:00',
+            user.connection_start or 'Unknown'
+        ))
         return {
-            'name': user['name'] or user['username'],
-            'username': user['username'],
-            'ip_address': user['ip_address'] or '0.0.0.0',
-            'mac_address': user['mac_address'] or '00:00:00:00:00:00',
-            'connection_start': user['connection_start'] or 'Unknown',
+            'name': name,
+            'username': username,
+            'ip_address': ip_address,
+            'mac_address': mac_address,
+            'connection_start': connection_start,
             'connection_duration': duration_minutes
         }
     except Exception as e:
@@ -89,38 +151,77 @@ def extract_user_info(user):
 
 def process_devices_data(devices):
     """Process and validate devices data from network scanner"""
-    if not devices:
-        return []
-    
+    return _process_devices(devices)
+
+def process_devices_with_arrays(devices):
+    """Process devices and build the analysis column arrays in the same pass"""
+    columns = ([], [], [])
+    processed_devices = _process_devices(devices, columns)
+    return processed_devices, _column_arrays(*columns)
+
+def _process_devices(devices, columns=None):
+    """Validate and enrich devices; append signal/status/type to columns when given"""
     processed_devices = []
-    for device in devices:
+    for device in devices or ():
         try:
-            processed_device = {
-                'id': device.get('id', 0),
-                'name': device.get('name', f"Device-{device.get('ip', 'Unknown').split('.')[-1]}"),
-                'ip': device.get('ip', '0.0.0.0'),
-                'mac': device.get('mac', 'Unknown'),
-                'type': device.get('type', 'unknown'),
-                'status': device.get('status', 'unknown'),
-                'signal': max(0, min(100, device.get('signal', 0)))  # Ensure signal is 0-100
-            }
-            processed_devices.append(processed_device)
+            try:
+                # Scanner devices always carry every field
+                id_, name, ip, mac, device_type, status, signal = _DEVICE_FIELDS(device)
+            except KeyError:
+                ip = device.get('ip', '0.0.0.0')
+                id_ = device.get('id', 0)
+                name = device['name'] if 'name' in device else f"Device-{device.get('ip', 'Unknown').split('.')[-1]}"
+                mac = device.get('mac', 'Unknown')
+                device_type = device.get('type', 'unknown')
+                status = device.get('status', 'unknown')
+                signal = device.get('signal', 0)
+            
+            signal = 0 if signal < 0 else 100 if signal > 100 else signal  # Ensure signal is 0-100
+            status_class, status_text = get_status_html(status)
+            processed_devices.append({
+                'id': id_,
+                'name': name,
+                'ip': ip,
+                'mac': mac,
+                'type': device_type,
+                'status': status,
+                'signal': signal,
+                # Escaped once here; the template emits these as-is in every section
+                'name_html': escape(name),
+                'ip_html': escape(ip),
+                'mac_html': escape(mac),
+                # Display values shared by the device cards and the device table
+                'status_class': status_class,
+                'status_text': status_text,
+                'icon': get_device_icon(device_type),
+                'type_name': get_device_type_name(device_type),
+                'signal_color': get_signal_color(signal)
+            })
         except Exception as e:
-            logger.warning(f"Error processing device {device}: {e}")
+            logger.warning("Error processing device %r: %s", device, e)
             continue
+        
+        if columns is not None:
+            columns[0].append(signal)
+            columns[1].append(status)
+            columns[2].append(device_type)
     
     return processed_devices
 
-def get_current_performance(performance_data):
-    """Get current network performance metrics"""
+def get_current_performance(performance_data, now=None):
+    """Get current network performance metrics, with averages from a ReportPerformance or database row"""
+    measurement_time = (now or datetime.datetime.now()).strftime('%H:%M:%S')
+    
     try:
         # Get real-time performance from network scanner
         current_bandwidth, current_latency = network_scanner.get_real_performance()
         
         # Use database averages if available, otherwise use current values
         if performance_data:
-            avg_bandwidth = performance_data.get('avg_bandwidth') or current_bandwidth
-            avg_latency = performance_data.get('avg_latency') or current_latency
+            if not isinstance(performance_data, ReportPerformance):
+                performance_data = ReportPerformance.from_row(performance_data)
+            avg_bandwidth = performance_data.avg_bandwidth or current_bandwidth
+            avg_latency = performance_data.avg_latency or current_latency
         else:
             avg_bandwidth = current_bandwidth
             avg_latency = current_latency
@@ -130,7 +231,7 @@ def get_current_performance(performance_data):
             'avg_bandwidth': avg_bandwidth,
             'current_latency': current_latency,
             'avg_latency': avg_latency,
-            'measurement_time': datetime.datetime.now().strftime('%H:%M:%S')
+            'measurement_time': measurement_time
         }
     except Exception as e:
         logger.error(f"Error getting performance data: {e}")
@@ -139,18 +240,24 @@ def get_current_performance(performance_data):
             'avg_bandwidth': 0,
             'current_latency': 999,
             'avg_latency': 999,
-            'measurement_time': datetime.datetime.now().strftime('%H:%M:%S')
+            'measurement_time': measurement_time
         }
 
 def get_infrastructure_data():
     """Get network infrastructure information"""
     try:
+        # The lookups touch sockets / subprocesses, so run them side by side
+        f_range = _infra_executor.submit(network_scanner.get_network_range)
+        f_gateway = _infra_executor.submit(network_scanner.get_gateway_ip)
+        f_local_ip = _infra_executor.submit(network_scanner.get_local_ip)
+        f_interfaces = _infra_executor.submit(network_scanner.get_network_interfaces)
+        f_mac = _infra_executor.submit(network_scanner.get_local_mac)
         return {
-            'network_range': network_scanner.get_network_range(),
-            'gateway_ip': network_scanner.get_gateway_ip(),
-            'local_ip': network_scanner.get_local_ip(),
-            'interfaces': network_scanner.get_network_interfaces(),
-            'local_mac': network_scanner.get_local_mac()
+            'network_range': f_range.result(),
+            'gateway_ip': f_gateway.result(),
+            'local_ip': f_local_ip.result(),
+            'interfaces': f_interfaces.result(),
+            'local_mac': f_mac.result()
         }
     except Exception as e:
         logger.error(f"Error getting infrastructure data: {e}")
@@ -162,14 +269,66 @@ def get_infrastructure_data():
             'local_mac': '00:00:00:00:00:00'
         }
 
-def analyze_network_state(devices, performance, infrastructure):
+# Integer codes for the device columns handed to the compiled analysis core
+_STATUS_CODES = {'online': 1, 'offline': 0}
+_TYPE_CODES = {'unknown': 0}
+
+def get_device_arrays(devices):
+    """Column view of the processed devices (signals, status codes, type codes) for the analysis core"""
+    return _column_arrays([d['signal'] for d in devices],
+                          [d['status'] for d in devices],
+                          [d['type'] for d in devices])
+
+def _column_arrays(signals, statuses, device_types):
+    """Analysis arrays from per-device signals, statuses and types (unknown status -1, known type 1)"""
+    status_codes = [_STATUS_CODES.get(status, -1) for status in statuses]
+    type_codes = [_TYPE_CODES.get(device_type, 1) for device_type in device_types]
+    return (np.array(signals, dtype=np.float64),
+            np.array(status_codes, dtype=np.int8),
+            np.array(type_codes, dtype=np.int8))
+
+if _JIT:
+    @njit(cache=True)
+    def _analyze_core(signals, status_codes, type_codes):
+        """Device counts and average online signal in a single compiled pass"""
+        online = offline = unknown = 0
+        signal_sum = 0.0
+        for i in range(signals.shape[0]):
+            s = status_codes[i]
+            if s == 1:
+                online += 1
+                signal_sum += signals[i]
+            elif s == 0:
+                offline += 1
+            if type_codes[i] == 0:
+                unknown += 1
+        avg_signal = signal_sum / online if online else 0.0
+        return online, offline, unknown, avg_signal
+else:
+    def _analyze_core(signals, status_codes, type_codes):
+        """Device counts and average online signal as NumPy reductions"""
+        online_mask = status_codes == 1
+        online = int(np.count_nonzero(online_mask))
+        avg_signal = float(signals[online_mask].sum()) / online if online else 0.0
+        return (online, int(np.count_nonzero(status_codes == 0)),
+                int(np.count_nonzero(type_codes == 0)), avg_signal)
+
+def analyze_network_state(devices, performance, infrastructure, device_columns=None):
     """Analyze network state and generate insights"""
+    signals, status_codes, type_codes = device_columns or get_device_arrays(devices)
+    online_count, offline_count, unknown_count, avg_signal = _analyze_core(signals, status_codes, type_codes)
+    
+    # Only the first few names are shown in the recommendations
+    online_mask = status_codes == 1
+    offline_names = [devices[i]['name'] for i in np.flatnonzero(status_codes == 0)[:3]]
+    weak_names = [devices[i]['name'] for i in np.flatnonzero(online_mask & (signals < 50))[:2]]
+    
     analysis = {
         'total_devices': len(devices),
-        'online_devices': len([d for d in devices if d['status'] == 'online']),
-        'offline_devices': len([d for d in devices if d['status'] == 'offline']),
+        'online_devices': online_count,
+        'offline_devices': offline_count,
         'issues_found': [],
-        'recommendations': [],
+        'recommendations': [],  # (css_class, text) pairs
         'security_alerts': [],
         'performance_score': 0,
         'performance_grade': 'C',
@@ -178,21 +337,14 @@ def analyze_network_state(devices, performance, infrastructure):
     
     try:
         # Analyze device connectivity
-        offline_devices = [d for d in devices if d['status'] == 'offline']
-        if offline_devices:
-            analysis['issues_found'].append(f"{len(offline_devices)} appareils hors ligne")
-            offline_names = [d['name'] for d in offline_devices[:3]]
-            analysis['recommendations'].append(f"🔴 Vérifier la connectivité: {', '.join(offline_names)}")
+        if offline_count:
+            analysis['issues_found'].append(f"{offline_count} appareils hors ligne")
+            analysis['recommendations'].append(('error', f"🔴 Vérifier la connectivité: {', '.join(offline_names)}"))
         
         # Analyze signal strength
-        online_devices = [d for d in devices if d['status'] == 'online']
-        if online_devices:
-            avg_signal = sum(d['signal'] for d in online_devices) / len(online_devices)
-            if avg_signal < 70:
-                analysis['issues_found'].append("Signal WiFi faible")
-                analysis['recommendations'].append("📶 Améliorer le positionnement du routeur")
-        else:
-            avg_signal = 0
+        if online_count and avg_signal < 70:
+            analysis['issues_found'].append("Signal WiFi faible")
+            analysis['recommendations'].append(('warning', "📶 Améliorer le positionnement du routeur"))
         
         # Analyze performance
         bandwidth = performance['avg_bandwidth']
@@ -200,23 +352,20 @@ def analyze_network_state(devices, performance, infrastructure):
         
         if bandwidth < 10:
             analysis['issues_found'].append("Bande passante insuffisante")
-            analysis['recommendations'].append("🌐 Contacter le fournisseur d'accès internet")
+            analysis['recommendations'].append(('', "🌐 Contacter le fournisseur d'accès internet"))
         
         if latency > 100:
             analysis['issues_found'].append("Latence réseau élevée")
-            analysis['recommendations'].append("⚡ Optimiser la configuration réseau")
+            analysis['recommendations'].append(('warning', "⚡ Optimiser la configuration réseau"))
         
         # Check for weak signal devices
-        weak_devices = [d for d in online_devices if d['signal'] < 50]
-        if weak_devices:
-            weak_names = [d['name'] for d in weak_devices[:2]]
-            analysis['recommendations'].append(f"📡 Signal faible: {', '.join(weak_names)} - rapprocher du routeur")
+        if weak_names:
+            analysis['recommendations'].append(('', f"📡 Signal faible: {', '.join(weak_names)} - rapprocher du routeur"))
         
         # Security analysis
-        unknown_devices = [d for d in devices if d['type'] == 'unknown']
-        if len(unknown_devices) > 3:
-            analysis['security_alerts'].append(f"{len(unknown_devices)} appareils non identifiés")
-            analysis['recommendations'].append("🔒 Vérifier les appareils non autorisés")
+        if unknown_count > 3:
+            analysis['security_alerts'].append(f"{unknown_count} appareils non identifiés")
+            analysis['recommendations'].append(('', "🔒 Vérifier les appareils non autorisés"))
         
         # Calculate performance score
         score = calculate_performance_score(bandwidth, latency, avg_signal, analysis['online_devices'], analysis['total_devices'])
@@ -226,7 +375,7 @@ def analyze_network_state(devices, performance, infrastructure):
         # Determine overall health
         if len(analysis['issues_found']) == 0:
             analysis['overall_health'] = 'excellent'
-            analysis['recommendations'].append("✅ Le réseau fonctionne de manière optimale")
+            analysis['recommendations'].append(('', "✅ Le réseau fonctionne de manière optimale"))
         elif bandwidth < 5 or latency > 200 or analysis['online_devices'] == 0:
             analysis['overall_health'] = 'poor'
         elif len(analysis['issues_found']) > 3:
@@ -242,385 +391,164 @@ def analyze_network_state(devices, performance, infrastructure):
 
 def calculate_performance_score(bandwidth, latency, signal, online_devices, total_devices):
     """Calculate overall performance score (0-100)"""
-    score = 0
-    
-    # Bandwidth score (40% weight)
-    if bandwidth >= 50:
-        score += 40
-    elif bandwidth >= 25:
-        score += 30
-    elif bandwidth >= 10:
-        score += 20
-    else:
-        score += 10
-    
-    # Latency score (30% weight)
-    if latency <= 20:
-        score += 30
-    elif latency <= 50:
-        score += 25
-    elif latency <= 100:
-        score += 15
-    else:
-        score += 5
-    
-    # Signal score (20% weight)
-    if signal >= 80:
-        score += 20
-    elif signal >= 60:
-        score += 15
-    elif signal >= 40:
-        score += 10
-    else:
-        score += 5
-    
-    # Connectivity score (10% weight)
-    if total_devices > 0:
-        connectivity_ratio = online_devices / total_devices
-        if connectivity_ratio >= 0.9:
-            score += 10
-        elif connectivity_ratio >= 0.7:
-            score += 8
-        elif connectivity_ratio >= 0.5:
-            score += 5
-        else:
-            score += 2
+    if not _JIT:
+        return _calc_score(bandwidth, latency, signal, online_devices, total_devices)
+    # Fixed argument types keep numba to a single compiled specialisation
+    return int(_calc_score(float(bandwidth), float(latency), float(signal),
+                           int(online_devices), int(total_devices)))
+
+# Score tables: thresholds and the points awarded in each band. Bandwidth, signal
+# and connectivity reward values at or above a threshold, latency at or below one.
+_BANDWIDTH_CUTS, _BANDWIDTH_POINTS = (10, 25, 50), (10, 20, 30, 40)
+_LATENCY_CUTS, _LATENCY_POINTS = (20, 50, 100), (30, 25, 15, 5)
+_SIGNAL_CUTS, _SIGNAL_POINTS = (40, 60, 80), (5, 10, 15, 20)
+_RATIO_CUTS, _RATIO_POINTS = (0.5, 0.7, 0.9), (2, 5, 8, 10)
+
+if _JIT:
+    # searchsorted needs arrays; numba freezes these module globals as constants
+    _BANDWIDTH_CUTS_NP = np.array(_BANDWIDTH_CUTS, dtype=np.float64)
+    _LATENCY_CUTS_NP = np.array(_LATENCY_CUTS, dtype=np.float64)
+    _SIGNAL_CUTS_NP = np.array(_SIGNAL_CUTS, dtype=np.float64)
+    _RATIO_CUTS_NP = np.array(_RATIO_CUTS, dtype=np.float64)
     
-    return min(100, max(0, score))
+    @njit(cache=True)
+    def _calc_score(bandwidth, latency, signal, online_devices, total_devices):
+        """Score core on plain scalars, compiled to native code"""
+        # Bandwidth (40%), latency (30%) and signal (20%) weights
+        score = _BANDWIDTH_POINTS[np.searchsorted(_BANDWIDTH_CUTS_NP, bandwidth, side='right')]
+        score += _LATENCY_POINTS[np.searchsorted(_LATENCY_CUTS_NP, latency, side='left')]
+        score += _SIGNAL_POINTS[np.searchsorted(_SIGNAL_CUTS_NP, signal, side='right')]
+        
+        # Connectivity score (10% weight)
+        if total_devices > 0:
+            score += _RATIO_POINTS[np.searchsorted(_RATIO_CUTS_NP, online_devices / total_devices, side='right')]
+        
+        return min(100, max(0, score))
+else:
+    def _calc_score(bandwidth, latency, signal, online_devices, total_devices):
+        """Score core on plain scalars"""
+        # Bandwidth (40%), latency (30%) and signal (20%) weights
+        score = _BANDWIDTH_POINTS[bisect_right(_BANDWIDTH_CUTS, bandwidth)]
+        score += _LATENCY_POINTS[bisect_left(_LATENCY_CUTS, latency)]
+        score += _SIGNAL_POINTS[bisect_right(_SIGNAL_CUTS, signal)]
+        
+        # Connectivity score (10% weight)
+        if total_devices > 0:
+            score += _RATIO_POINTS[bisect_right(_RATIO_CUTS, online_devices / total_devices)]
+        
+        return min(100, max(0, score))
+
+# Compile at startup rather than on the first report
+_calc_score(0.0, 0.0, 0.0, 0, 0)
+_analyze_core(*get_device_arrays([]))
+
+# Minimum score for grades C, B and A; anything below 55 is a D
+_GRADE_CUTOFFS = (55, 70, 85)
+_GRADE_LETTERS = 'DCBA'
 
 def get_performance_grade(score):
     """Convert score to letter grade"""
-    if score >= 85:
-        return 'A'
-    elif score >= 70:
-        return 'B'
-    elif score >= 55:
-        return 'C'
-    else:
-        return 'D'
+    return _GRADE_LETTERS[bisect_right(_GRADE_CUTOFFS, score)]
+
+# Device status -> (CSS class, label) and signal color thresholds for the report
+_STATUS_HTML = {
+    'online': ('online', '🟢 En ligne'),
+    'offline': ('offline', '🔴 Hors ligne')
+}
+_SIGNAL_COLORS = (('#dc3545', 40), ('#ffc107', 70), ('#28a745', 100))
+
+def get_status_html(status):
+    """Get (CSS class, label) for a device status"""
+    return _STATUS_HTML.get(status, _STATUS_HTML['offline'])
+
+def get_signal_color(signal):
+    """Get the signal bar color for a 0-100 signal"""
+    if signal.__class__ is int and 0 <= signal <= 100:
+        return _SIGNAL_COLOR_LUT[signal]
+    return next((color for color, limit in _SIGNAL_COLORS if signal <= limit), '#28a745')
+
+# Color for every whole-number signal, indexed by the signal itself
+_SIGNAL_COLOR_LUT = tuple(next(color for color, limit in _SIGNAL_COLORS if signal <= limit)
+                          for signal in range(101))
+
+# Device type -> emoji icon / French name
+_DEVICE_ICONS = {
+    'router': '🌐',
+    'server': '🖥️',
+    'desktop': '💻',
+    'laptop': '💻',
+    'phone': '📱',
+    'printer': '🖨️',
+    'camera': '📹',
+    'unknown': '❓'
+}
+_DEVICE_TYPE_NAMES = {
+    'router': 'Routeur',
+    'server': 'Serveur',
+    'desktop': 'Ordinateur de bureau',
+    'laptop': 'Ordinateur portable',
+    'phone': 'Téléphone',
+    'printer': 'Imprimante',
+    'camera': 'Caméra',
+    'unknown': 'Inconnu'
+}
 
 def get_device_icon(device_type):
     """Get emoji icon for device type"""
-    icons = {
-        'router': '🌐',
-        'server': '🖥️',
-        'desktop': '💻',
-        'laptop': '💻',
-        'phone': '📱',
-        'printer': '🖨️',
-        'camera': '📹',
-        'unknown': '❓'
-    }
-    return icons.get(device_type, '❓')
+    return _DEVICE_ICONS.get(device_type, '❓')
 
 def get_device_type_name(device_type):
     """Get French name for device type"""
-    names = {
-        'router': 'Routeur',
-        'server': 'Serveur',
-        'desktop': 'Ordinateur de bureau',
-        'laptop': 'Ordinateur portable',
-        'phone': 'Téléphone',
-        'printer': 'Imprimante',
-        'camera': 'Caméra',
-        'unknown': 'Inconnu'
-    }
-    return names.get(device_type, 'Inconnu')
+    return _DEVICE_TYPE_NAMES.get(device_type, 'Inconnu')
+
+# Report template, compiled once at import
+_TEMPLATE_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'templates')
+_ENV = jinja2.Environment(loader=jinja2.FileSystemLoader(_TEMPLATE_DIR), autoescape=True)
+_REPORT_TEMPLATE = _ENV.get_template('report.html')
+_ERROR_TEMPLATE = _ENV.get_template('error_report.html')
+
+def format_report_time(now):
+    """Format a report timestamp, reusing the string for calls within the same second"""
+    return _format_report_second(now.replace(microsecond=0))
 
-def generate_html_report(user_info, devices, performance, infrastructure, analysis):
+@functools.lru_cache(maxsize=1)
+def _format_report_second(now):
+    return now.strftime('%d/%m/%Y à %H:%M:%S')
+
+def generate_html_report(user_info, devices, performance, infrastructure, analysis, now=None, css_url=None):
     """Generate the complete HTML report"""
+    return ''.join(iter_html_report(user_info, devices, performance, infrastructure, analysis, now, css_url))
+
+def iter_html_report(user_info, devices, performance, infrastructure, analysis, now=None, css_url=None):
+    """Yield the HTML report in chunks, for callers that can stream it"""
     
     # Get current timestamp
-    report_time = datetime.datetime.now().strftime('%d/%m/%Y à %H:%M:%S')
-    current_year = datetime.datetime.now().year
-    
-    # Calculate network statistics
-    total_devices = analysis['total_devices']
-    online_devices = analysis['online_devices']
-    offline_devices = analysis['offline_devices']
-    
-    # Generate device cards HTML
-    device_cards_html = ""
-    for device in devices:
-        status_class = 'online' if device['status'] == 'online' else 'offline'
-        device_cards_html += f"""
-        <div class="device-card {status_class}">
-            <div class="device-icon">{get_device_icon(device['type'])}</div>
-            <div class="device-name">{device['name']}</div>
-            <div class="device-ip">{device['ip']}</div>
-            <div class="device-signal">Signal: {device['signal']}%</div>
-        </div>
-        """
-    
-    # Generate device table HTML
-    device_table_html = ""
-    for device in devices:
-        signal = device['signal']
-        signal_color = '#28a745' if signal > 70 else '#ffc107' if signal > 40 else '#dc3545'
-        status_class = 'online' if device['status'] == 'online' else 'offline'
-        
-        device_table_html += f"""
-        <tr>
-            <td><strong>{device['name']}</strong></td>
-            <td>{get_device_type_name(device['type'])}</td>
-            <td><code>{device['ip']}</code></td>
-            <td><code>{device['mac']}</code></td>
-            <td class="status-{status_class}">
-                {"🟢 En ligne" if device['status'] == "online" else "🔴 Hors ligne"}
-            </td>
-            <td>
-                <div class="signal-display">
-                    {signal}%
-                    <div class="signal-bar">
-                        <div class="signal-fill" style="width: {signal}%; background-color: {signal_color};"></div>
-                    </div>
-                </div>
-            </td>
-        </tr>
-        """
-    
-    # Generate interfaces HTML
-    interfaces_html = ""
-    if infrastructure['interfaces']:
-        interface_rows = ""
-        for interface in infrastructure['interfaces']:
-            status_class = 'online' if interface.get('status') == 'up' else 'offline'
-            interface_rows += f"""
-            <tr>
-                <td><strong>{interface.get('name', 'Unknown')}</strong></td>
-                <td><code>{interface.get('ip', 'N/A')}</code></td>
-                <td><code>{interface.get('netmask', 'N/A')}</code></td>
-                <td class="status-{status_class}">
-                    {"🟢 Actif" if interface.get('status') == 'up' else "🔴 Inactif"}
-                </td>
-                <td>{interface.get('speed', 'N/A')} Mbps</td>
-            </tr>
-            """
-        
-        interfaces_html = f"""
-        <div class="section">
-            <h2><span class="icon">🔧</span>Interfaces Réseau</h2>
-            <table>
-                <thead>
-                    <tr>
-                        <th>Interface</th>
-                        <th>Adresse IP</th>
-                        <th>Masque</th>
-                        <th>Statut</th>
-                        <th>Vitesse</th>
-                    </tr>
-                </thead>
-                <tbody>
-                    {interface_rows}
-                </tbody>
-            </table>
-        </div>
-        """
+    if now is None:
+        now = datetime.datetime.now()
+    report_time = format_report_time(now)
+    current_year = now.year
     
-    # Generate recommendations HTML
-    recommendations_html = ""
-    for rec in analysis['recommendations']:
-        css_class = "error" if "🔴" in rec else "warning" if "⚠️" in rec or "📶" in rec or "⚡" in rec else ""
-        recommendations_html += f'<li class="recommendation-item {css_class}">{rec}</li>'
-    
-    # Generate issues HTML
-    issues_html = ""
-    if analysis['issues_found']:
-        issues_list = "".join([f'<li class="issue-item">{issue}</li>' for issue in analysis['issues_found']])
-        issues_html = f'<ul class="issues-list">{issues_list}</ul>'
-    else:
-        issues_html = '<p class="no-issues">✅ Aucun problème critique détecté</p>'
-    
-    # Generate security alerts HTML
-    security_html = ""
-    if analysis['security_alerts']:
-        security_list = "".join([f'<li class="security-item">{alert}</li>' for alert in analysis['security_alerts']])
-        security_html = f"""
-        <div class="section">
-            <h2><span class="icon">🔒</span>Alertes de Sécurité</h2>
-            <ul class="security-list">{security_list}</ul>
-        </div>
-        """
-    
-    return f"""<!DOCTYPE html>
-<html lang="fr">
-<head>
-    <meta charset="UTF-8">
-    <meta name="viewport" content="width=device-width, initial-scale=1.0">
-    <title>Rapport Réseau - {user_info['name']}</title>
-    <style>
-        {get_report_css()}
-    </style>
-</head>
-<body>
-    <div class="container">
-        <div class="header">
-            <h1>📊 Rapport de Diagnostic Réseau</h1>
-            <div class="subtitle">
-                Généré le {report_time}<br>
-                Analyse du réseau de {user_info['name']}
-            </div>
-        </div>
-        
-        <div class="content">
-            <!-- Performance Grade -->
-            <div class="performance-grade grade-{analysis['performance_grade']}">
-                <div class="grade-icon">🏆</div>
-                <div class="grade-info">
-                    <h2>Note Globale: {analysis['performance_grade']}</h2>
-                    <p>Score: {analysis['performance_score']}/100 • État: {analysis['overall_health'].title()}</p>
-                </div>
-            </div>
-            
-            <!-- User Information -->
-            <div class="section">
-                <h2><span class="icon">👤</span>Informations Utilisateur</h2>
-                <div class="info-grid">
-                    <div class="info-item">
-                        <span class="info-label">Nom:</span>
-                        <span class="info-value">{user_info['name']}</span>
-                    </div>
-                    <div class="info-item">
-                        <span class="info-label">Nom d'utilisateur:</span>
-                        <span class="info-value">{user_info['username']}</span>
-                    </div>
-                    <div class="info-item">
-                        <span class="info-label">Adresse IP:</span>
-                        <span class="info-value">{user_info['ip_address']}</span>
-                    </div>
-                    <div class="info-item">
-                        <span class="info-label">Adresse MAC:</span>
-                        <span class="info-value">{user_info['mac_address']}</span>
-                    </div>
-                    <div class="info-item">
-                        <span class="info-label">Connexion depuis:</span>
-                        <span class="info-value">{user_info['connection_start']}</span>
-                    </div>
-                    <div class="info-item">
-                        <span class="info-label">Durée de session:</span>
-                        <span class="info-value">{user_info['connection_duration']} minutes</span>
-                    </div>
-                </div>
-            </div>
-            
-            <!-- Network Statistics -->
-            <div class="section">
-                <h2><span class="icon">📈</span>Statistiques Réseau</h2>
-                <div class="stats-grid">
-                    <div class="stat-card">
-                        <div class="stat-icon">🌐</div>
-                        <div class="stat-info">
-                            <div class="stat-value">{performance['avg_bandwidth']:.1f} Mbps</div>
-                            <div class="stat-label">Bande Passante</div>
-                        </div>
-                    </div>
-                    <div class="stat-card">
-                        <div class="stat-icon">⚡</div>
-                        <div class="stat-info">
-                            <div class="stat-value">{performance['avg_latency']:.0f} ms</div>
-                            <div class="stat-label">Latence</div>
-                        </div>
-                    </div>
-                    <div class="stat-card {'success' if online_devices == total_devices else 'warning' if online_devices > 0 else 'error'}">
-                        <div class="stat-icon">📱</div>
-                        <div class="stat-info">
-                            <div class="stat-value">{online_devices}/{total_devices}</div>
-                            <div class="stat-label">Appareils En Ligne</div>
-                        </div>
-                    </div>
-                    <div class="stat-card">
-                        <div class="stat-icon">🔗</div>
-                        <div class="stat-info">
-                            <div class="stat-value">{infrastructure['network_range']}.0/24</div>
-                            <div class="stat-label">Réseau</div>
-                        </div>
-                    </div>
-                </div>
-            </div>
-            
-            <!-- Device Map -->
-            <div class="section">
-                <h2><span class="icon">🗺️</span>Cartographie des Appareils</h2>
-                <div class="device-map">
-                    {device_cards_html}
-                </div>
-            </div>
-            
-            <!-- Device Details Table -->
-            <div class="section">
-                <h2><span class="icon">📋</span>Détails des Appareils</h2>
-                <div class="table-container">
-                    <table>
-                        <thead>
-                            <tr>
-                                <th>Nom</th>
-                                <th>Type</th>
-                                <th>IP</th>
-                                <th>MAC</th>
-                                <th>Statut</th>
-                                <th>Signal</th>
-                            </tr>
-                        </thead>
-                        <tbody>
-                            {device_table_html}
-                        </tbody>
-                    </table>
-                </div>
-            </div>
-            
-            {interfaces_html}
-            
-            <!-- Issues Found -->
-            <div class="section">
-                <h2><span class="icon">⚠️</span>Problèmes Détectés</h2>
-                {issues_html}
-            </div>
-            
-            <!-- Recommendations -->
-            <div class="section">
-                <h2><span class="icon">💡</span>Recommandations</h2>
-                <ul class="recommendations-list">
-                    {recommendations_html}
-                </ul>
-            </div>
-            
-            {security_html}
-            
-            <!-- Infrastructure Summary -->
-            <div class="section">
-                <h2><span class="icon">🏗️</span>Infrastructure Réseau</h2>
-                <div class="infrastructure-grid">
-                    <div class="infra-item">
-                        <span class="infra-label">Passerelle:</span>
-                        <span class="infra-value">{infrastructure['gateway_ip']}</span>
-                    </div>
-                    <div class="infra-item">
-                        <span class="infra-label">Plage réseau:</span>
-                        <span class="infra-value">{infrastructure['network_range']}.0/24</span>
-                    </div>
-                    <div class="infra-item">
-                        <span class="infra-label">Votre IP:</span>
-                        <span class="infra-value">{infrastructure['local_ip']}</span>
-                    </div>
-                    <div class="infra-item">
-                        <span class="infra-label">Votre MAC:</span>
-                        <span class="infra-value">{infrastructure['local_mac']}</span>
-                    </div>
-                </div>
-            </div>
-        </div>
-        
-        <div class="footer">
-            <p><strong>Network Diagnostic Tool</strong> • Généré le {report_time}</p>
-            <p>© {current_year} • Données collectées en temps réel</p>
-        </div>
-    </div>
-</body>
-</html>"""
+    return _REPORT_TEMPLATE.generate(
+        user_info=user_info,
+        devices=devices,
+        performance=performance,
+        infrastructure=infrastructure,
+        analysis=analysis,
+        report_time=report_time,
+        current_year=current_year,
+        css=_REPORT_CSS,
+        css_url=css_url
+    )
 
-def get_report_css():
-    """Return the CSS styles for the report"""
-    return """
+def _minify_css(css):
+    """Strip comments and redundant whitespace from a stylesheet"""
+    css = re.sub(r'/\*.*?\*/', '', css, flags=re.S)
+    css = re.sub(r'\s+', ' ', css)
+    css = re.sub(r'\s*([{};:,])\s*', r'\1', css)
+    return css.replace(';}', '}').strip()
+
+# Report stylesheet, minified once at import and shared by every report
+_REPORT_CSS = _minify_css("""
         * {
             margin: 0;
             padding: 0;
@@ -963,26 +891,40 @@ def get_report_css():
                 -webkit-print-color-adjust: exact;
             }
         }
-    """
+    """)
+
+# Compressed once for serving the stylesheet as a separate, cacheable asset
+_REPORT_CSS_GZIP = gzip.compress(_REPORT_CSS.encode('utf-8'), mtime=0)
+# Content hash for the stylesheet URL, so a changed stylesheet gets a new URL
+_REPORT_CSS_VERSION = hashlib.blake2b(_REPORT_CSS.encode('utf-8'), digest_size=6).hexdigest()
+
+def get_report_css():
+    """Return the CSS styles for the report"""
+    return _REPORT_CSS
+
+def get_report_css_gzip():
+    """Return the report CSS, gzip-compressed"""
+    return _REPORT_CSS_GZIP
 
-def generate_error_report(error_message):
+def get_report_css_version():
+    """Return a short content hash of the report CSS"""
+    return _REPORT_CSS_VERSION
+
+def generate_error_report(error_message, now=None):
     """Generate error report when main report generation fails"""
-    current_time = datetime.datetime.now().strftime('%d/%m/%Y à %H:%M:%S')
+    current_time = format_report_time(now or datetime.datetime.now())
     
-    return f"""<!DOCTYPE html>
-<html lang="fr">
-<head>
-    <meta charset="UTF-8">
-    <meta name="viewport" content="width=device-width, initial-scale=1.0">
-    <title>Erreur - Rapport de Diagnostic Réseau</title>
-    <style>
-        body {{
+    return _ERROR_TEMPLATE.render(error_message=error_message, current_time=current_time, css=_ERROR_CSS)
+
+# Error report stylesheet, kept apart from the small dynamic part of the page
+_ERROR_CSS = _minify_css("""
+        body {
             font-family: 'Segoe UI', Tahoma, Geneva, Verdana, sans-serif;
             background: #f8f9fa;
             padding: 20px;
             margin: 0;
-        }}
-        .error-container {{
+        }
+        .error-container {
             max-width: 600px;
             margin: 50px auto;
             background: white;
@@ -990,17 +932,17 @@ def generate_error_report(error_message):
             border-radius: 15px;
             box-shadow: 0 10px 30px rgba(0,0,0,0.1);
             text-align: center;
-        }}
-        .error-icon {{
+        }
+        .error-icon {
             font-size: 4em;
             color: #dc3545;
             margin-bottom: 20px;
-        }}
-        h1 {{
+        }
+        h1 {
             color: #dc3545;
             margin-bottom: 20px;
-        }}
-        .error-message {{
+        }
+        .error-message {
             background: #f8d7da;
             color: #721c24;
             padding: 20px;
@@ -1008,67 +950,34 @@ def generate_error_report(error_message):
             margin: 20px 0;
             border: 1px solid #f5c6cb;
             word-wrap: break-word;
-        }}
-        .timestamp {{
+        }
+        .timestamp {
             color: #6c757d;
             font-size: 0.9em;
             margin-top: 20px;
-        }}
-        .retry-info {{
+        }
+        .retry-info {
             background: #d1ecf1;
             color: #0c5460;
             padding: 15px;
             border-radius: 8px;
             margin-top: 20px;
-        }}
-    </style>
-</head>
-<body>
-    <div class="error-container">
-        <div class="error-icon">⚠️</div>
-        <h1>Erreur de Génération du Rapport</h1>
-        <p>Une erreur s'est produite lors de la génération du rapport de diagnostic réseau.</p>
-        
-        <div class="error-message">
-            <strong>Détails de l'erreur:</strong><br>
-            {error_message}
-        </div>
-        
-        <div class="retry-info">
-            <strong>💡 Solutions suggérées:</strong><br>
-            • Actualisez la page et réessayez<br>
-            • Vérifiez votre connexion réseau<br>
-            • Contactez l'administrateur système si le problème persiste
-        </div>
-        
-        <div class="timestamp">
-            Erreur survenue le {current_time}
-        </div>
-    </div>
-</body>
-</html>"""
+        }
+    """)
 
 # Test function to validate the report generator
 def test_report_generation():
     """Test the report generator with sample data"""
     try:
-        # Create sample user data (simulating SQLite Row)
-        class MockUser:
-            def __init__(self):
-                self.data = {
-                    'id': 1,
-                    'username': 'testuser',
-                    'name': 'Test User',
-                    'ip_address': '192.168.1.100',
-                    'mac_address': 'AA:BB:CC:DD:EE:FF',
-                    'connection_start': '2025-01-15 10:30:00'
-                }
-            
-            def __getitem__(self, key):
-                return self.data.get(key)
-            
-            def get(self, key, default=None):
-                return self.data.get(key, default)
+        # Create sample user data
+        sample_user = ReportUser(
+            id=1,
+            username='testuser',
+            name='Test User',
+            ip_address='192.168.1.100',
+            mac_address='AA:BB:CC:DD:EE:FF',
+            connection_start='2025-01-15 10:30:00'
+        )
         
         # Create sample devices data
         sample_devices = [
@@ -1111,25 +1020,32 @@ def test_report_generation():
         ]
         
         # Create sample performance data
-        class MockPerformance:
-            def __init__(self):
-                self.data = {
-                    'avg_bandwidth': 45.5,
-                    'avg_latency': 28.3
-                }
-            
-            def get(self, key, default=None):
-                return self.data.get(key, default)
-        
-        mock_user = MockUser()
-        mock_performance = MockPerformance()
+        sample_performance = ReportPerformance(avg_bandwidth=45.5, avg_latency=28.3)
         
         # Generate report
-        report_html = generate_report(mock_user, sample_devices, mock_performance)
+        report_html = generate_report(sample_user, sample_devices, sample_performance)
         
-        # Save test report
-        with open('test_network_report.html', 'w', encoding='utf-8') as f:
-            f.write(report_html)
+        # Save test report: encode once and write the bytes straight to the file descriptor,
+        # unless the digest sidecar shows the file on disk already holds this exact report
+        data = report_html.encode('utf-8')
+        digest = hashlib.blake2b(data, digest_size=16).digest()
+        sidecar = 'test_network_report.html.blake2'
+        try:
+            with open(sidecar, 'rb') as f:
+                unchanged = f.read() == digest and os.path.exists('test_network_report.html')
+        except OSError:
+            unchanged = False
+        
+        if not unchanged:
+            fd = os.open('test_network_report.html', os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o644)
+            try:
+                view = memoryview(data)
+                while view:
+                    view = view[os.write(fd, view):]
+            finally:
+                os.close(fd)
+            with open(sidecar, 'wb') as f:
+                f.write(digest)
         
         print("✅ Test report generated successfully!")
         print(f"📄 Report saved as 'test_network_report.html' ({len(report_html)} characters)")